@@ -1,55 +1,130 @@
 import os
+import re
 import json
-import uuid
+import hashlib
+import threading
 import urllib.parse
-from urllib.parse import urljoin
+from collections import OrderedDict
+from functools import lru_cache
 from flask import Flask, request, jsonify
-from bs4 import BeautifulSoup, Tag, NavigableString
+from flask.json.provider import DefaultJSONProvider
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer, Tag, NavigableString
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 
+if orjson is not None:
+    # Ricos output is a deeply nested dict tree; orjson serializes it
+    # several times faster than the stdlib encoder behind jsonify.
+    class ORJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+
+# Prefer the C-based lxml backend; fall back to the stdlib parser when
+# lxml is not installed so the service still comes up.
+try:
+    BeautifulSoup("", "lxml")
+    _BS4_PARSER = "lxml"
+except FeatureNotFound:
+    _BS4_PARSER = "html.parser"
+
+# Only these tags are ever consulted by the converter; straining the parse
+# to them keeps the lxml tree small even for multi-hundred-KB documents.
+_STRAINER = SoupStrainer([
+    "body", "style", "h1", "h2", "h3", "h4", "p", "ul", "ol", "li",
+    "table", "tr", "td", "th", "img", "a", "span", "br"
+])
+
 # =========================
 # Helpers
 # =========================
 
+# Every node gets an 8-hex-char id. uuid4 per call reads the CSPRNG and
+# formats 16 bytes each time; pulling one os.urandom batch and slicing
+# 4-byte chunks is an order of magnitude cheaper per id.
+_ID_BUF = b""
+_ID_POS = 0
+# Flask's dev server (and a threaded gunicorn worker) runs requests on
+# threads, so the check-refill-slice sequence must not interleave or two
+# requests can be handed the same id. The uncontended lock is cheap; the
+# urandom refill it protects only happens once per ~1000 ids.
+_ID_LOCK = threading.Lock()
+
 def generate_id():
-    return str(uuid.uuid4())[:8]
+    global _ID_BUF, _ID_POS
+    with _ID_LOCK:
+        if _ID_POS + 4 > len(_ID_BUF):
+            _ID_BUF = os.urandom(4096)
+            _ID_POS = 0
+        v = _ID_BUF[_ID_POS:_ID_POS + 4]
+        _ID_POS += 4
+    return v.hex()
 
 def empty_paragraph():
     return {"type": "PARAGRAPH", "id": generate_id(), "nodes": [], "style": {}}
 
+# Invariant decoration fragments, built once instead of per text node.
+# They are only ever read during JSON serialization, so sharing by
+# reference is safe.
+_DEC_BOLD = {"type": "BOLD", "fontWeightValue": 700}
+_DEC_COLOR_LINK = {"type": "COLOR", "colorData": {"foreground": "#3A11AE", "background": "transparent"}}
+_DEC_COLOR_BLACK = {"type": "COLOR", "colorData": {"foreground": "rgb(0, 0, 0)", "background": "transparent"}}
+_DEC_UNDERLINE = {"type": "UNDERLINE"}
+
+# The two non-link shapes cover the vast majority of text nodes; keep
+# them as frozen templates and hand out shallow list copies.
+_DEC_PLAIN = (_DEC_COLOR_BLACK,)
+_DEC_BOLD_PLAIN = (_DEC_BOLD, _DEC_COLOR_BLACK)
+
 def format_decorations(is_bold=False, is_link=False, link_url=None, is_underline=False):
-    dec = []
-    if is_bold or is_link:
-        dec.append({"type": "BOLD", "fontWeightValue": 700})
-    if is_link:
-        dec.append({"type": "COLOR", "colorData": {"foreground": "#3A11AE", "background": "transparent"}})
-    else:
-        dec.append({"type": "COLOR", "colorData": {"foreground": "rgb(0, 0, 0)", "background": "transparent"}})
-    if is_link and link_url:
+    if not is_link:
+        dec = list(_DEC_BOLD_PLAIN if is_bold else _DEC_PLAIN)
+        if is_underline:
+            dec.append(_DEC_UNDERLINE)
+        return dec
+    dec = [_DEC_BOLD, _DEC_COLOR_LINK]
+    if link_url:
         dec.append({
             "type": "LINK",
             "linkData": {"link": {"url": link_url, "target": "BLANK", "rel": {"noreferrer": True}}}
         })
     if is_underline:
-        dec.append({"type": "UNDERLINE"})
+        dec.append(_DEC_UNDERLINE)
     return dec
 
+# Prototype for the TEXT node shell; dict.copy() of a prebuilt template
+# is cheaper than re-hashing the key literals on every call.
+_TEXT_NODE_PROTO = {"type": "TEXT", "id": "", "textData": None}
+
 def build_text_node(text, bold=False, link=None, underline=False, extra_decorations=None):
     decorations = format_decorations(bold, bool(link), link, underline)
     if extra_decorations:
         decorations.extend([d for d in extra_decorations if d])
-    return {"type": "TEXT", "id": generate_id(), "textData": {"text": text, "decorations": decorations}}
+    node = _TEXT_NODE_PROTO.copy()
+    node["id"] = generate_id()
+    node["textData"] = {"text": text, "decorations": decorations}
+    return node
 
 def wrap_paragraph_nodes(nodes):
     return {"type": "PARAGRAPH", "id": generate_id(), "nodes": nodes, "style": {}}
 
+# Fixed font-size decorations, shared by reference (read-only downstream).
+_FONT16 = ({"type": "FONT_SIZE", "fontSizeData": {"unit": "PX", "value": 16}},)
+_FONT22 = ({"type": "FONT_SIZE", "fontSizeData": {"unit": "PX", "value": 22}},)
+
 def wrap_heading(text, level=2):
-    decorations = []
-    if level == 3:
-        decorations.append({"type": "FONT_SIZE", "fontSizeData": {"unit": "PX", "value": 22}})
+    decorations = _FONT22 if level == 3 else None
     return {
         "type": "HEADING",
         "id": generate_id(),
@@ -58,6 +133,13 @@ def wrap_heading(text, level=2):
         "headingData": {"level": level, "textStyle": {"textAlignment": "AUTO"}}
     }
 
+# Constant style fragments for list items and header/leading table
+# cells; shared by reference, never mutated downstream.
+_LI_STYLE = {"paddingTop": "0px", "paddingBottom": "0px"}
+_LI_PARA_DATA = {"textStyle": {"lineHeight": "2"}}
+_HL_STYLE = {"verticalAlignment": "TOP", "backgroundColor": "#CAB8FF"}
+_EMPTY_CELL_STYLE = {}
+
 def wrap_list(items, ordered=False):
     return {
         "type": "ORDERED_LIST" if ordered else "BULLETED_LIST",
@@ -65,16 +147,15 @@ def wrap_list(items, ordered=False):
         "nodes": [
             {"type": "LIST_ITEM", "id": generate_id(), "nodes": [
                 {"type": "PARAGRAPH", "id": generate_id(), "nodes": item,
-                 "style": {"paddingTop": "0px", "paddingBottom": "0px"},
-                 "paragraphData": {"textStyle": {"lineHeight": "2"}}}
+                 "style": _LI_STYLE,
+                 "paragraphData": _LI_PARA_DATA}
             ]} for item in items
         ]
     }
 
 def wrap_table(table_data):
     num_rows = len(table_data)
-    num_cols = max(len(row) for row in table_data) if table_data else 0
-    highlight_style = {"verticalAlignment": "TOP", "backgroundColor": "#CAB8FF"}
+    num_cols = len(max(table_data, key=len)) if table_data else 0
     return {
         "type": "TABLE",
         "id": generate_id(),
@@ -84,12 +165,11 @@ def wrap_table(table_data):
                     wrap_paragraph_nodes([
                         build_text_node(
                             node["textData"]["text"],
-                            extra_decorations=[{"type": "FONT_SIZE", "fontSizeData": {"unit": "PX", "value": 16}}]
-                            if r_idx > 0 and c_idx > 0 else None
+                            extra_decorations=_FONT16 if r_idx > 0 and c_idx > 0 else None
                         ) for node in cell if node["type"] == "TEXT"
                     ])
                 ],
-                 "tableCellData": {"cellStyle": highlight_style if r_idx == 0 or c_idx == 0 else {}}}
+                 "tableCellData": {"cellStyle": _HL_STYLE if r_idx == 0 or c_idx == 0 else _EMPTY_CELL_STYLE}}
                 for c_idx, cell in enumerate(row)
             ]} for r_idx, row in enumerate(table_data)
         ],
@@ -100,29 +180,45 @@ def wrap_table(table_data):
         }}
     }
 
+def _norm_dict(obj):
+    media_id = obj.get("id") or obj.get("ID") or obj.get("mediaId")
+    if not media_id:
+        return None
+    out = {"id": media_id}
+    if "width" in obj and "height" in obj:
+        out["width"] = obj["width"]
+        out["height"] = obj["height"]
+    return out
+
+# Media id segment of a wixstatic URL; one compiled match instead of
+# two chained splits per value.
+_WIX_MEDIA_RE = re.compile(r"static\.wixstatic\.com/media/([^/]+)")
+
+def _norm_str(obj):
+    m = _WIX_MEDIA_RE.search(obj)
+    if m:
+        return {"id": m.group(1)}
+    if "~mv2." in obj:
+        return {"id": obj}
+    return None
+
+# Map entries come straight from JSON decoding, so exact-type dispatch
+# is safe and skips the isinstance ladder per image.
+_NORM_HANDLERS = {dict: _norm_dict, str: _norm_str}
+
 def _normalize_img_obj(obj):
     """
     Normalize to {'id': <wix_media_id>, 'width':?, 'height':?}
     """
-    if isinstance(obj, dict):
-        media_id = obj.get("id") or obj.get("ID") or obj.get("mediaId")
-        if not media_id:
-            return None
-        out = {"id": media_id}
-        if "width" in obj and "height" in obj:
-            out["width"] = obj["width"]
-            out["height"] = obj["height"]
-        return out
-    elif isinstance(obj, str):
-        if "static.wixstatic.com/media/" in obj:
-            try:
-                media_id = obj.split('/media/')[1].split('/')[0]
-                return {"id": media_id}
-            except IndexError:
-                return None
-        if "~mv2." in obj and "static.wixstatic.com/media/" not in obj:
-            return {"id": obj}
-    return None
+    handler = _NORM_HANDLERS.get(type(obj))
+    return handler(obj) if handler is not None else None
+
+# Shared read-only containerData for every IMAGE node.
+_IMG_CONTAINER = {
+    "width": {"size": "CONTENT"},
+    "alignment": "CENTER",
+    "textWrap": True
+}
 
 def wrap_image(img_obj, alt=""):
     norm = _normalize_img_obj(img_obj)
@@ -148,28 +244,40 @@ def wrap_image(img_obj, alt=""):
         "id": generate_id(),
         "nodes": [],
         "imageData": {
-            "containerData": {
-                "width": {"size": "CONTENT"},
-                "alignment": "CENTER",
-                "textWrap": True
-            },
+            "containerData": _IMG_CONTAINER,
             "image": image_dict
         }
     }
 
+@lru_cache(maxsize=2048)
+def _basename(src: str) -> str:
+    # HTML srcs always use "/", so a plain rfind beats os.path.basename
+    # (which goes through os.path.split); hot srcs repeat, hence the cache.
+    i = src.rfind("/")
+    return src[i + 1:] if i >= 0 else src
+
 def is_absolute_url(url: str) -> bool:
-    return url.startswith("http://") or url.startswith("https://") or url.startswith("//")
+    return url.startswith(("http://", "https://", "//"))
+
+# Sentinel for map lookups: a key mapped to null is a hit (the caller
+# asked for that image to be suppressed), not a miss to fall through.
+_MISS = object()
 
-def resolve_image_src(src: str, base_url: str | None, image_url_map: dict | None, images_fifo: list | None):
+def resolve_image_src(src: str, base_url: str | None, image_url_map: dict | None, images_fifo: list | None,
+                      basename_index: dict | None = None):
     if not src:
         return None
 
     if image_url_map:
-        if src in image_url_map:
-            return image_url_map[src]
-        base = os.path.basename(src)
-        if base in image_url_map:
-            return image_url_map[base]
+        hit = image_url_map.get(src, _MISS)
+        if hit is not _MISS:
+            return hit
+        if basename_index is not None:
+            hit = basename_index.get(_basename(src), _MISS)
+        else:
+            hit = image_url_map.get(_basename(src), _MISS)
+        if hit is not _MISS:
+            return hit
 
     if images_fifo is not None and len(images_fifo) > 0:
         return images_fifo.pop(0)
@@ -179,135 +287,221 @@ def resolve_image_src(src: str, base_url: str | None, image_url_map: dict | None
 
     return None
 
+def _append_block(nodes, trailing, node, block_type, prev_type):
+    """Append a block plus its spacing; returns (trailing, prev_type).
+
+    Lives at module scope so the per-request closure only forwards to
+    it; trailing is the count of empty spacer paragraphs at the tail of
+    nodes, threaded through explicitly instead of via cell variables.
+    """
+    if node is None:
+        return trailing, prev_type
+    b, a = apply_spacing(nodes, block_type)
+    if block_type == "H2" and prev_type == "IMAGE":
+        b = 1
+    while trailing < b:
+        nodes.append(empty_paragraph()); trailing += 1
+    while trailing > b:
+        nodes.pop(); trailing -= 1
+    nodes.append(node)
+    for _ in range(a):
+        nodes.append(empty_paragraph())
+    return a, block_type
+
 def apply_spacing(nodes, block_type):
     before = {"H2": 2, "H3": 1, "H4": 1, "ORDERED_LIST": 1, "BULLETED_LIST": 1, "PARAGRAPH": 1, "IMAGE": 1}
     after  = {"H2": 1, "H3": 1, "H4": 1, "ORDERED_LIST": 1, "BULLETED_LIST": 1, "PARAGRAPH": 1, "IMAGE": 1, "TABLE": 2}
     return before.get(block_type, 0), after.get(block_type, 0)
 
-def count_trailing_empty_paragraphs(nodes):
-    cnt = 0
-    for n in reversed(nodes):
-        if n["type"] == "PARAGRAPH" and not n["nodes"]:
-            cnt += 1
-        else:
-            break
-    return cnt
-
-def ensure_spacing(nodes, required):
-    current = count_trailing_empty_paragraphs(nodes)
-    while current < required:
-        nodes.append(empty_paragraph()); current += 1
-    while current > required:
-        nodes.pop(); current -= 1
+@lru_cache(maxsize=4096)
+def _clean_href(href):
+    """Decode an anchor href, unwrapping Google redirect wrappers.
 
-def extract_parts(tag, bold_class, base_url, image_url_map, images_fifo):
+    unquote is pure Python and the same href tends to repeat across a
+    document (and across requests), so the result is memoized.
+    """
+    if "google.com/url?q=" in href:
+        href = href.split("q=")[1].split("&")[0]
+    # unquote walks the string in Python; skip it when there is nothing
+    # to decode, which is the common case for ordinary links.
+    return urllib.parse.unquote(href) if "%" in href else href
+
+def extract_parts(tag, bold_ids, on_image=None):
+    # Iterative walk with an explicit stack of child iterators: nested
+    # inline markup no longer costs a Python frame per level and cannot
+    # hit the recursion limit on pathological HTML.
+    #
+    # on_image, when given, is called with (parts, img_tag) at each
+    # <img> in document order and returns the parts list to continue
+    # with - this lets the paragraph handler emit interleaved IMAGE
+    # blocks in a single traversal instead of a separate img pre-pass.
     parts = []
-    for item in tag.children:
+    stack = [iter(tag.children)]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
         if isinstance(item, NavigableString):
-            txt = str(item)
-            if txt.strip():
-                is_bold = item.parent.name == "span" and bold_class and bold_class in item.parent.get("class", [])
-                parts.append(build_text_node(txt, bold=is_bold))
+            # NavigableString is a str subclass; isspace() rejects the
+            # (numerous) whitespace-only fragments without allocating the
+            # str(item) copy and the stripped throwaway.
+            if not item or item.isspace():
+                continue
+            is_bold = id(item.parent) in bold_ids
+            parts.append(build_text_node(str(item), bold=is_bold))
         elif isinstance(item, Tag):
             if item.name == "br":
                 continue
             if item.name == "img" and item.get("src"):
+                if on_image is not None:
+                    parts = on_image(parts, item)
                 continue
             elif item.name == "a" and item.get("href"):
-                href = item["href"]
-                if "google.com/url?q=" in href:
-                    href = urllib.parse.unquote(href.split("q=")[1].split("&")[0])
-                else:
-                    href = urllib.parse.unquote(href)
-                is_bold = any(
-                    child.name == "span" and bold_class and bold_class in child.get("class", [])
-                    for child in item.descendants if isinstance(child, Tag)
+                href = _clean_href(item["href"])
+                is_bold = bool(bold_ids) and any(
+                    id(child) in bold_ids for child in item.find_all("span")
                 )
                 parts.append(build_text_node(item.get_text(), bold=is_bold, link=href, underline=True))
+                # Anchors are leaves for text purposes, but linked images
+                # (<a href><img></a>) still have to reach the image hook.
+                if on_image is not None:
+                    for im in item.find_all("img"):
+                        if im.get("src"):
+                            parts = on_image(parts, im)
             else:
-                parts.extend(extract_parts(item, bold_class, base_url, image_url_map, images_fifo))
+                stack.append(iter(item.children))
     return parts
 
 # =========================
 # HTML → Ricos
 # =========================
 
+# First class rule whose body sets font-weight:700 - the bold marker
+# class emitted by Google Docs exports. One C-level pass over the style
+# block instead of splitting it into a Python list per rule.
+_BOLD_CLASS_RE = re.compile(r"\.([A-Za-z0-9_-]+)\s*\{[^}]*font-weight\s*:\s*700")
+
 def html_to_ricos(html_string, base_url=None, image_url_map=None, images_fifo=None):
-    soup = BeautifulSoup(html_string, "html.parser")
+    soup = BeautifulSoup(html_string, _BS4_PARSER, parse_only=_STRAINER)
     body = soup.body or soup
     nodes = []
     bold_class = None
 
     style_tag = soup.find("style")
     if style_tag and style_tag.string:
-        for ln in style_tag.string.split("}"):
-            if "font-weight:700" in ln:
-                cls = ln.split("{")[0].strip()
-                if cls.startswith("."):
-                    bold_class = cls[1:]
-                    break
+        m = _BOLD_CLASS_RE.search(style_tag.string)
+        if m:
+            bold_class = m.group(1)
+
+    # Index the map by basename once so per-image fallback lookups are a
+    # single dict probe instead of recomputing basenames against the map.
+    basename_index = None
+    if image_url_map:
+        basename_index = {_basename(k): v for k, v in image_url_map.items()}
+
+    # Resolve every bold span once up front; the per-text-node class-list
+    # scans become O(1) id lookups. find_all's class_ matcher accepts any
+    # class name, unlike a CSS selector, which rejects e.g. leading digits.
+    if bold_class:
+        bold_ids = frozenset(id(t) for t in soup.find_all("span", class_=bold_class))
+    else:
+        bold_ids = frozenset()
+
+    # Number of empty spacer paragraphs currently at the tail of nodes.
+    # Tracking it as state avoids re-scanning the list tail before and
+    # after every block, which was quadratic on long documents.
+    trailing = 0
 
     def add_node(node, block_type, prev_type=None):
-        if node is None:
-            return prev_type
-        b, a = apply_spacing(nodes, block_type)
-        if block_type == "H2" and prev_type == "IMAGE":
-            b = 1
-        ensure_spacing(nodes, b)
-        nodes.append(node)
-        needed = a - count_trailing_empty_paragraphs(nodes)
-        for _ in range(max(0, needed)):
-            nodes.append(empty_paragraph())
+        nonlocal trailing
+        trailing, block_type = _append_block(nodes, trailing, node, block_type, prev_type)
         return block_type
 
+    # An <img> can only produce a node via the map, the fifo, or a
+    # literal ~mv2 media id in its src. When none of those can apply the
+    # per-block img scans are guaranteed dead work, so skip them.
+    scan_images = bool(image_url_map) or bool(images_fifo) or "~mv2." in html_string
+
     prev = None
-    for elem in body.find_all(recursive=False):
-        tag = elem.name
-        if tag == "img" and elem.get("src"):
-            img_obj = resolve_image_src(elem["src"], base_url, image_url_map, images_fifo)
+
+    def flush_image(parts, im):
+        # Paragraph-level image hook: resolve first, and only close the
+        # text run collected so far when the image actually materializes.
+        # An unresolvable src must not split the surrounding paragraph.
+        nonlocal prev
+        u = resolve_image_src(im["src"], base_url, image_url_map, images_fifo, basename_index)
+        node = wrap_image(u, im.get("alt", ""))
+        if node is None:
+            return parts
+        if parts:
+            prev = add_node(wrap_paragraph_nodes(parts), "PARAGRAPH", prev)
+        prev = add_node(node, "IMAGE", prev)
+        return []
+
+    def handle_img(elem):
+        nonlocal prev
+        if elem.get("src"):
+            img_obj = resolve_image_src(elem["src"], base_url, image_url_map, images_fifo, basename_index)
             prev = add_node(wrap_image(img_obj, elem.get("alt", "")), "IMAGE", prev)
 
-        elif tag in ["h2", "h3", "h4"]:
-            level = int(tag[1])
+    def handle_heading(elem):
+        nonlocal prev
+        level = int(elem.name[1])
+        if scan_images:
             for im in elem.find_all("img"):
-                u = resolve_image_src(im["src"], base_url, image_url_map, images_fifo)
+                u = resolve_image_src(im["src"], base_url, image_url_map, images_fifo, basename_index)
                 prev = add_node(wrap_image(u, im.get("alt", "")), "IMAGE", prev)
-                im.decompose()
-            
-            txt = elem.get_text(strip=True)
-            if txt:
-                prev = add_node(wrap_heading(txt, level), f"H{level}", prev)
-
-        elif tag == "p":
-            imgs = elem.find_all("img")
-            if imgs:
-                for im in imgs:
-                    u = resolve_image_src(im["src"], base_url, image_url_map, images_fifo)
-                    prev = add_node(wrap_image(u, im.get("alt", "")), "IMAGE", prev)
-                    im.decompose()
-
-            parts = extract_parts(elem, bold_class, base_url, image_url_map, images_fifo)
-            if parts:
-                prev = add_node(wrap_paragraph_nodes(parts), "PARAGRAPH", prev)
-
-        elif tag in ["ul", "ol"]:
-            items = [extract_parts(li, bold_class, base_url, image_url_map, images_fifo)
-                     for li in elem.find_all("li", recursive=False)]
-            items = [i for i in items if i]
-            if items:
-                prev = add_node(wrap_list(items, ordered=(tag == "ol")), "ORDERED_LIST" if tag == "ol" else "BULLETED_LIST", prev)
-
-        elif tag == "table":
-            table = [
-                [extract_parts(td, bold_class, base_url, image_url_map, images_fifo) for td in tr.find_all(["td", "th"])]
-                for tr in elem.find_all("tr")
-            ]
-            if table:
-                table_node = wrap_table(table)
-                prev = add_node(table_node, "TABLE", prev)
-
-    while nodes and nodes[-1]["type"] == "PARAGRAPH" and not nodes[-1]["nodes"]:
-        nodes.pop()
+                # extract() just detaches the tag before get_text;
+                # decompose() would also tear down its subtree.
+                im.extract()
+
+        txt = elem.get_text(strip=True)
+        if txt:
+            prev = add_node(wrap_heading(txt, level), f"H{level}", prev)
+
+    def handle_paragraph(elem):
+        nonlocal prev
+        parts = extract_parts(elem, bold_ids, flush_image if scan_images else None)
+        if parts:
+            prev = add_node(wrap_paragraph_nodes(parts), "PARAGRAPH", prev)
+
+    def handle_list(elem):
+        nonlocal prev
+        ordered = elem.name == "ol"
+        items = [extract_parts(li, bold_ids)
+                 for li in elem.children if isinstance(li, Tag) and li.name == "li"]
+        items = [i for i in items if i]
+        if items:
+            prev = add_node(wrap_list(items, ordered=ordered), "ORDERED_LIST" if ordered else "BULLETED_LIST", prev)
+
+    def handle_table(elem):
+        nonlocal prev
+        table = [
+            [extract_parts(td, bold_ids) for td in tr.find_all(["td", "th"])]
+            for tr in elem.find_all("tr")
+        ]
+        if table:
+            prev = add_node(wrap_table(table), "TABLE", prev)
+
+    # O(1) dispatch instead of a chain of string compares per element.
+    handlers = {
+        "img": handle_img,
+        "h2": handle_heading, "h3": handle_heading, "h4": handle_heading,
+        "p": handle_paragraph,
+        "ul": handle_list, "ol": handle_list,
+        "table": handle_table,
+    }
+
+    for elem in body.children:
+        if not isinstance(elem, Tag):
+            continue
+        handler = handlers.get(elem.name)
+        if handler is not None:
+            handler(elem)
+
+    if trailing:
+        del nodes[-trailing:]
 
     return {"nodes": nodes}
 
@@ -315,9 +509,52 @@ def html_to_ricos(html_string, base_url=None, image_url_map=None, images_fifo=No
 # Flask Endpoint
 # =========================
 
+# Converted documents cached by content digest, so retries and repeated
+# batch conversions of the same article skip the parse + walk entirely.
+# Results are treated as read-only once built, which makes sharing safe.
+_RESULT_CACHE = OrderedDict()
+_RESULT_CACHE_MAX = 128
+# Same threading story as the id pool: move_to_end/popitem on a shared
+# OrderedDict are not safe against concurrent mutation.
+_RESULT_CACHE_LOCK = threading.Lock()
+
+def _stream_ricos(result):
+    # Serialize one top-level node per chunk so peak memory stays at
+    # tree + one node instead of tree + full serialized body.
+    yield b'{"nodes":['
+    first = True
+    for node in result["nodes"]:
+        if first:
+            first = False
+        else:
+            yield b","
+        yield orjson.dumps(node)
+    yield b"]}"
+
+def _ricos_response(result):
+    if orjson is not None:
+        return app.response_class(_stream_ricos(result), mimetype="application/json")
+    return jsonify(result)
+
+def _result_cache_key(html_string, base_url, image_url_map):
+    # Length-prefix each field so the boundaries are part of the hash;
+    # plain concatenation would let html "<p>x</p>https://a.co" collide
+    # with html "<p>x</p>" plus base_url "https://a.co".
+    h = hashlib.blake2b(digest_size=16)
+    map_json = json.dumps(image_url_map, sort_keys=True, default=str) if image_url_map else ""
+    for part in (html_string, base_url or "", map_json):
+        data = part.encode()
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.digest()
+
 @app.route("/convert-html", methods=["POST"])
 def convert_html():
-    data = request.get_json()
+    # Parse the body exactly once; silent+cache=False skips Flask's
+    # error re-raise machinery and drops the cached copy of the payload.
+    data = request.get_json(silent=True, cache=False)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object body"}), 400
 
     html_string = data.get("html")
     base_url = data.get("base_url")
@@ -341,13 +578,30 @@ def convert_html():
 
     images_fifo = data.get("images_fifo")
 
+    # images_fifo is consumed while converting, so those requests are
+    # not cacheable; everything else is keyed on html + map content.
+    cache_key = None
+    if not images_fifo:
+        cache_key = _result_cache_key(html_string, base_url, image_url_map)
+        with _RESULT_CACHE_LOCK:
+            result = _RESULT_CACHE.get(cache_key)
+            if result is not None:
+                _RESULT_CACHE.move_to_end(cache_key)
+        if result is not None:
+            return _ricos_response(result)
+
     result = html_to_ricos(
         html_string,
         base_url=base_url,
         image_url_map=image_url_map,
         images_fifo=images_fifo
     )
-    return jsonify(result)
+    if cache_key is not None:
+        with _RESULT_CACHE_LOCK:
+            _RESULT_CACHE[cache_key] = result
+            if len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+                _RESULT_CACHE.popitem(last=False)
+    return _ricos_response(result)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))